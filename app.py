@@ -1,39 +1,91 @@
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
 from routes.ingest import router as ingest_router
 from routes.query import router as query_router
 from routes.clients import router as clients_router
+from rag.generator import get_generator
+import hashlib
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="Enterprise RAG System",
     description="Client-isolated Retrieval-Augmented Generation API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-# Add CORS middleware for web access
+# Add CORS middleware for web access (comma-separated CORS_ORIGINS overrides the defaults)
+CORS_ORIGINS = os.environ.get(
+    "CORS_ORIGINS", "http://localhost:8000,http://127.0.0.1:8000"
+).split(",")
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify your domain
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,
 )
 
+# Compress HTML/JSON responses; registered last so it wraps CORS as the outermost layer
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+
 app.include_router(ingest_router, prefix="/clients", tags=["Ingestion"])
 app.include_router(query_router, prefix="/clients", tags=["Query"])
 app.include_router(clients_router, tags=["Clients"])
 
+@app.on_event("startup")
+async def init_cache():
+    """Set up the in-process response cache used by read-only GET routes."""
+    FastAPICache.init(InMemoryBackend(), prefix="rag-cache")
+
+@app.on_event("startup")
+async def preload_generator():
+    """Load the LLM before serving so the first query doesn't pay the model-load cost."""
+    try:
+        get_generator()
+    except Exception as e:
+        # Health, ingestion and listings don't need the LLM; queries retry the load after a backoff
+        logger.error(f"LLM preload failed, queries will retry the load later: {e}")
+
+# Read the frontend once at startup instead of reopening it on every hit
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.html"), "rb") as f:
+    _INDEX_BYTES = f.read()
+_INDEX_ETAG = f'"{hashlib.md5(_INDEX_BYTES).hexdigest()}"'
+_INDEX_HEADERS = {"ETag": _INDEX_ETAG, "Cache-Control": "public, max-age=300"}
+
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Serve the main frontend page."""
-    return FileResponse("index.html", media_type="text/html")
+    if request.headers.get("if-none-match") == _INDEX_ETAG:
+        return Response(status_code=304, headers=_INDEX_HEADERS)
+    return Response(_INDEX_BYTES, media_type="text/html", headers=_INDEX_HEADERS)
+
+# Health payload never changes, so serialize it once at import time
+_HEALTH = ORJSONResponse({"status": "ok", "message": "Enterprise RAG System is running!"})
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "message": "Enterprise RAG System is running!"}
+    return _HEALTH
 
-@app.get("/health")
-def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", 8000)),
+        loop="uvloop",
+        http="httptools",
+        # Every worker loads its own copy of the LLM at startup (~2 GB for the GPT4All
+        # default, a whole GPU for vLLM), so default to one and scale with WEB_CONCURRENCY
+        workers=int(os.environ.get("WEB_CONCURRENCY", 1))
+    )
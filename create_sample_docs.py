@@ -4,33 +4,35 @@ Create comprehensive sample documents for the RAG system.
 Generates detailed multi-paragraph documents for testing.
 """
 
-from fpdf import FPDF
-from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from pathlib import Path
+import hashlib
+import json
 import os
 
 def create_comprehensive_pdf(filename, title, sections):
     """Create a comprehensive PDF document."""
+    from fpdf import FPDF  # provided by fpdf2; imported lazily to keep module import cheap
+
     pdf = FPDF()
+    pdf.set_auto_page_break(True)
     pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
+    pdf.set_font("Helvetica", 'B', 16)
 
     # Title
     pdf.cell(0, 10, title, 0, 1, 'C')
     pdf.ln(10)
 
-    pdf.set_font("Arial", '', 12)
-
     for section_title, paragraphs in sections:
         # Section header
-        pdf.set_font("Arial", 'B', 14)
+        pdf.set_font("Helvetica", 'B', 14)
         pdf.cell(0, 8, section_title, 0, 1)
         pdf.ln(3)
 
-        # Section content
-        pdf.set_font("Arial", '', 12)
-        for paragraph in paragraphs:
-            lines = pdf.multi_cell(0, 6, paragraph)
-            pdf.ln(3)
+        # Section content in a single multi_cell call
+        pdf.set_font("Helvetica", '', 12)
+        pdf.multi_cell(0, 6, "\n\n".join(paragraphs))
 
         pdf.ln(5)
 
@@ -38,20 +40,45 @@ def create_comprehensive_pdf(filename, title, sections):
 
 def create_comprehensive_docx(filename, title, sections):
     """Create a comprehensive DOCX document."""
+    from docx import Document  # imported lazily; python-docx pulls in lxml
+
     doc = Document()
+    body = doc.element.body
+
+    # Detach the trailing section properties so paragraphs can be appended in bulk
+    # instead of each insert searching for w:sectPr; it is re-attached at the end
+    sect_pr = body.sectPr
+    if sect_pr is not None:
+        body.remove(sect_pr)
+
     doc.add_heading(title, 0)
 
     for section_title, paragraphs in sections:
         doc.add_heading(section_title, level=1)
+        body.extend([_docx_paragraph(paragraph) for paragraph in paragraphs])
 
-        for paragraph in paragraphs:
-            doc.add_paragraph(paragraph)
+    if sect_pr is not None:
+        body.append(sect_pr)
 
     doc.save(filename)
 
-def get_hr_policy_content():
-    """Generate comprehensive HR policy content."""
-    return [
+def _docx_paragraph(text):
+    """Build a plain <w:p> element holding a single text run."""
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
+    t = OxmlElement('w:t')
+    t.set(qn('xml:space'), 'preserve')
+    t.text = text
+    r = OxmlElement('w:r')
+    r.append(t)
+    p = OxmlElement('w:p')
+    p.append(r)
+    return p
+
+# Section content for every sample document, keyed by document slug
+_CONTENT = {
+    "hr_policy": [
         ("Introduction", [
             "This comprehensive Human Resources Policy Manual serves as the foundation for TechCorp Solutions' commitment to creating a positive, productive, and inclusive work environment. Our policies are designed to protect both employees and the organization while promoting fairness, respect, and professional growth.",
             "These policies apply to all employees, contractors, and temporary workers engaged by TechCorp Solutions. Management has the responsibility to ensure compliance with these policies and to communicate them effectively to their teams."
@@ -81,11 +108,8 @@ def get_hr_policy_content():
             "Employees are encouraged to create individual development plans with their managers, identifying skills they want to develop and career goals they wish to pursue. The company provides resources and time to support these development activities.",
             "Leadership development programs are available for high-potential employees, preparing them for future leadership roles within the organization."
         ])
-    ]
-
-def get_it_security_content():
-    """Generate comprehensive IT security content."""
-    return [
+    ],
+    "it_security": [
         ("Security Overview", [
             "Information security is fundamental to TechCorp Solutions' operations and our clients' trust. This comprehensive security framework protects sensitive data, ensures regulatory compliance, and mitigates cyber threats through layered security controls and employee awareness.",
             "Our security program follows industry best practices including NIST, ISO 27001, and SOC 2 standards. Regular audits and assessments ensure our security measures remain effective against evolving threats."
@@ -120,11 +144,8 @@ def get_it_security_content():
             "Documentation of security policies, procedures, and controls is maintained and regularly updated. Version control and approval processes ensure documentation remains current and accurate.",
             "Third-party vendors and partners must meet our security requirements before being granted access to our systems or data. Regular security assessments are conducted for critical vendors."
         ])
-    ]
-
-def get_benefits_content():
-    """Generate comprehensive benefits content."""
-    return [
+    ],
+    "benefits": [
         ("Health and Wellness", [
             "TechCorp Solutions prioritizes employee health and wellness through comprehensive medical coverage, preventive care, and wellness programs. Our health insurance plans provide extensive coverage for medical, dental, and vision services.",
             "Preventive care services are fully covered, including annual physicals, vaccinations, and screening tests. Wellness programs include gym memberships, smoking cessation support, and mental health resources.",
@@ -155,11 +176,8 @@ def get_benefits_content():
             "Perks include commuter benefits, company-sponsored social events, and discounts on products and services. TechCorp branded merchandise and technology discounts are popular employee favorites.",
             "Volunteer time off encourages community involvement with paid time for volunteer activities. Company matching for charitable donations supports employees' philanthropic efforts."
         ])
-    ]
-
-def get_remote_work_content():
-    """Generate comprehensive remote work content."""
-    return [
+    ],
+    "remote_work": [
         ("Remote Work Philosophy", [
             "TechCorp Solutions embraces remote work as a strategic advantage, enabling us to attract top talent worldwide while reducing overhead costs and environmental impact. Our remote-first approach prioritizes flexibility, productivity, and employee satisfaction.",
             "Research shows that remote work can increase productivity, reduce turnover, and improve work-life balance. We design our policies and tools to maximize these benefits while maintaining strong team collaboration and company culture."
@@ -194,11 +212,8 @@ def get_remote_work_content():
             "IT support is available 24/7 for remote employees. Help desk services, device troubleshooting, and technical assistance ensure minimal downtime.",
             "Learning and development resources are fully accessible remotely. Online training, virtual conferences, and digital libraries support continuous professional growth."
         ])
-    ]
-
-def get_code_of_conduct_content():
-    """Generate comprehensive code of conduct content."""
-    return [
+    ],
+    "code_of_conduct": [
         ("Ethical Standards", [
             "Integrity forms the foundation of TechCorp Solutions' culture. We conduct business with honesty, transparency, and ethical behavior in all interactions with customers, partners, competitors, and each other.",
             "Employees are expected to make decisions that benefit the company while considering the impact on stakeholders. Conflicts of interest must be disclosed and managed appropriately.",
@@ -234,11 +249,8 @@ def get_code_of_conduct_content():
             "Company-sponsored community programs provide opportunities for employees to contribute to local communities and causes.",
             "Philanthropic activities align with our values and support education, technology access, and community development."
         ])
-    ]
-
-def get_holiday_policy_content():
-    """Generate comprehensive holiday policy content."""
-    return [
+    ],
+    "holiday_policy": [
         ("Paid Time Off Overview", [
             "TechCorp Solutions provides generous paid time off to support work-life balance and employee wellness. Our PTO policy includes vacation days, holidays, and personal time that increases with tenure.",
             "PTO accrues monthly based on years of service and full-time/part-time status. Employees can view their balance and request time off through our HR portal.",
@@ -274,30 +286,66 @@ def get_holiday_policy_content():
             "Intermittent leave is available for serious health conditions or family care needs. Documentation requirements vary by leave type and duration.",
             "Return-to-work procedures ensure smooth reintegration. Employees receive updates on work matters during extended absences."
         ])
-    ]
+    ],
+}
+
+def get_content(name):
+    """Return the (section_title, paragraphs) list for a sample document."""
+    return _CONTENT[name]
+
+def _renderer_key():
+    """Identify this script and the PDF/DOCX library versions that render the documents."""
+    source_hash = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+    return [source_hash, metadata.version("fpdf2"), metadata.version("python-docx")]
+
+def _content_hash(title, content):
+    """Hash a document's title, sections and renderer so unchanged documents can be skipped."""
+    return hashlib.sha256(json.dumps([_renderer_key(), title, content]).encode()).hexdigest()
+
+def _build_one(spec):
+    """Build a single document from a (filename, title, content) spec.
+
+    Returns the output path and whether the build was skipped because the
+    sidecar ``.hash`` file shows neither the content, the renderer nor the
+    output file itself has changed.
+    """
+    filename, title, content = spec
+    filepath = Path("data") / filename
+    hash_path = filepath.with_name(filepath.name + ".hash")
+    key = _content_hash(title, content)
+
+    # The output's mtime guards against it being rewritten by another script (e.g. generate_docs.py)
+    if filepath.exists() and hash_path.exists() and hash_path.read_text() == f"{key} {filepath.stat().st_mtime_ns}":
+        return str(filepath), True
+
+    if filename.endswith('.pdf'):
+        create_comprehensive_pdf(str(filepath), title, content)
+    elif filename.endswith('.docx'):
+        create_comprehensive_docx(str(filepath), title, content)
+
+    hash_path.write_text(f"{key} {filepath.stat().st_mtime_ns}")
+    return str(filepath), False
 
 def main():
     """Generate all comprehensive sample documents."""
-    os.makedirs("data", exist_ok=True)
+    Path("data").mkdir(exist_ok=True)
 
     documents = [
-        ("hr_policy.pdf", "Human Resources Policy Manual", get_hr_policy_content()),
-        ("it_security_guidelines.docx", "Information Technology Security Guidelines", get_it_security_content()),
-        ("employee_benefits.pdf", "Employee Benefits Guide", get_benefits_content()),
-        ("remote_work_policy.pdf", "Remote Work Policy and Guidelines", get_remote_work_content()),
-        ("code_of_conduct.pdf", "Employee Code of Conduct", get_code_of_conduct_content()),
-        ("holiday_time_off.pdf", "Holiday and Time Off Policy", get_holiday_policy_content()),
+        ("hr_policy.pdf", "Human Resources Policy Manual", get_content("hr_policy")),
+        ("it_security_guidelines.docx", "Information Technology Security Guidelines", get_content("it_security")),
+        ("employee_benefits.pdf", "Employee Benefits Guide", get_content("benefits")),
+        ("remote_work_policy.pdf", "Remote Work Policy and Guidelines", get_content("remote_work")),
+        ("code_of_conduct.pdf", "Employee Code of Conduct", get_content("code_of_conduct")),
+        ("holiday_time_off.pdf", "Holiday and Time Off Policy", get_content("holiday_policy")),
     ]
 
-    for filename, title, content in documents:
-        filepath = os.path.join("data", filename)
-
-        if filename.endswith('.pdf'):
-            create_comprehensive_pdf(filepath, title, content)
-        elif filename.endswith('.docx'):
-            create_comprehensive_docx(filepath, title, content)
-
-        print(f"✅ Created: {filepath} - {len(content)} sections, {sum(len(paragraphs) for _, paragraphs in content)} total paragraphs")
+    # Documents are independent, so build them in parallel across cores
+    with ProcessPoolExecutor(max_workers=min(len(documents), os.cpu_count() or 1)) as executor:
+        for (_, _, content), (filepath, skipped) in zip(documents, executor.map(_build_one, documents)):
+            if skipped:
+                print(f"⏭️  Skipped (unchanged): {filepath}")
+            else:
+                print(f"✅ Created: {filepath} - {len(content)} sections, {sum(len(paragraphs) for _, paragraphs in content)} total paragraphs")
 
 if __name__ == "__main__":
     main()
@@ -4,19 +4,25 @@ Generate fake enterprise documents for testing the RAG system.
 Creates 6 documents with 5-12 paragraphs each in PDF and DOCX formats.
 """
 
-from fpdf import FPDF
+from fpdf import FPDF  # provided by fpdf2
 from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+import hashlib
+import json
 import os
 
+HASHES_PATH = os.path.join("data", ".hashes.json")
+
 def create_pdf(filename, title, paragraphs):
     """Create a PDF document with title and paragraphs."""
     pdf = FPDF()
     pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
+    pdf.set_font("Helvetica", 'B', 16)
     pdf.cell(0, 10, title, 0, 1, 'C')
     pdf.ln(10)
 
-    pdf.set_font("Arial", '', 12)
+    pdf.set_font("Helvetica", '', 12)
 
     for paragraph in paragraphs:
         # Handle line breaks and word wrapping
@@ -129,6 +135,43 @@ def generate_benefits_policy():
         "Regular benefits fairs and one-on-one consultations ensure employees understand and maximize their benefits. Open enrollment occurs annually with opportunities for changes."
     ]
 
+def _build(entry):
+    """Build a single document from a (filename, title, paragraphs) entry."""
+    filename, title, paragraphs = entry
+    filepath = os.path.join("data", filename)
+
+    if filename.endswith('.pdf'):
+        create_pdf(filepath, title, paragraphs)
+    elif filename.endswith('.docx'):
+        create_docx(filepath, title, paragraphs)
+
+    return filepath
+
+def _renderer_key():
+    """Identify this script and the PDF/DOCX library versions that render the documents."""
+    with open(__file__, "rb") as f:
+        source_hash = hashlib.sha256(f.read()).hexdigest()
+    return json.dumps([source_hash, metadata.version("fpdf2"), metadata.version("python-docx")])
+
+def _hash(title, paragraphs):
+    """Hash a document's source text and renderer so unchanged documents can be skipped."""
+    return hashlib.sha256((_renderer_key() + title + "\n".join(paragraphs)).encode()).hexdigest()
+
+def _load_hashes():
+    """Load the {filename: [content_hash, mtime_ns]} map from the last run."""
+    try:
+        with open(HASHES_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _is_unchanged(hashes, filename, filepath, content_hash):
+    """True if the file exists and neither its content nor the file itself changed since the last run."""
+    if not os.path.exists(filepath):
+        return False
+    # mtime guards against the file being rewritten by another script (e.g. create_sample_docs.py)
+    return hashes.get(filename) == [content_hash, os.stat(filepath).st_mtime_ns]
+
 def main():
     """Generate all documents."""
     documents = [
@@ -142,15 +185,24 @@ def main():
 
     os.makedirs("data", exist_ok=True)
 
-    for filename, title, paragraphs in documents:
+    hashes = _load_hashes()
+    pending = []
+    for entry in documents:
+        filename, title, paragraphs = entry
         filepath = os.path.join("data", filename)
-
-        if filename.endswith('.pdf'):
-            create_pdf(filepath, title, paragraphs)
-        elif filename.endswith('.docx'):
-            create_docx(filepath, title, paragraphs)
-
-        print(f"Generated: {filepath} - {len(paragraphs)} paragraphs")
+        if _is_unchanged(hashes, filename, filepath, _hash(title, paragraphs)):
+            print(f"⏭️  Skipped (unchanged): {filepath}")
+        else:
+            pending.append(entry)
+
+    # Documents are independent, so build them in parallel across cores
+    with ProcessPoolExecutor() as executor:
+        for (filename, title, paragraphs), filepath in zip(pending, executor.map(_build, pending)):
+            hashes[filename] = [_hash(title, paragraphs), os.stat(filepath).st_mtime_ns]
+            print(f"Generated: {filepath} - {len(paragraphs)} paragraphs")
+
+    with open(HASHES_PATH, "w") as f:
+        json.dump(hashes, f, indent=2, sort_keys=True)
 
 if __name__ == "__main__":
     main()
@@ -3,9 +3,52 @@ Document chunking utilities for the RAG system.
 Provides functions to split text documents into manageable chunks with metadata.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 import re
 
+try:
+    # Optional native sentence splitter; handles abbreviations like "Dr." correctly
+    from blingfire import text_to_sentences
+except ImportError:
+    text_to_sentences = None
+
+# Patterns used on every chunked document, compiled once at import
+_WS_RE = re.compile(r'\s+')
+_NL_RE = re.compile(r'\n\s*\n')
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+_SENTENCE_ENDINGS = ('.', '!', '?')
+
+
+def _sentence_ends(words: List[str]) -> List[int]:
+    """
+    Word offsets just past each sentence, matching a split on whitespace after [.!?].
+    """
+    ends = [i for i, word in enumerate(words, start=1) if word.endswith(_SENTENCE_ENDINGS)]
+    if words and (not ends or ends[-1] != len(words)):
+        ends.append(len(words))
+    return ends
+
+
+def _chunk_boundaries(sentence_ends: List[int], chunk_size: int,
+                      chunk_overlap: int) -> Iterator[Tuple[int, int]]:
+    """
+    Compute [start, end) word offsets of each chunk from sentence end offsets.
+
+    Sentences are packed into a chunk until the next one would exceed chunk_size;
+    the following chunk then starts chunk_overlap words before the boundary.
+    An overlap of 0, or one longer than the chunk, carries the whole chunk over.
+    """
+    start = end = 0
+    for sentence_end in sentence_ends:
+        if sentence_end - start > chunk_size and end > start:
+            yield start, end
+            if chunk_overlap and end - start >= chunk_overlap:
+                start = end - chunk_overlap
+        end = sentence_end
+
+    if end > start:
+        yield start, end
+
 
 class DocumentChunker:
     """Handles document text chunking with metadata preservation."""
@@ -30,91 +73,99 @@ class DocumentChunker:
             metadata: Base metadata to include with each chunk
 
         Returns:
-            List of chunk dictionaries with text and metadata
+            List of chunk dictionaries with text and metadata. Chunks carry no
+            'total_chunks' field; consumers that need it use len() of the list.
+        """
+        return list(self.iter_chunks(text, metadata))
+
+    def iter_chunks(self, text: str, metadata: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
         """
+        Lazily yield chunks with metadata as they are built.
+
+        Args:
+            text: The full text to chunk
+            metadata: Base metadata to include with each chunk
+
+        Yields:
+            Chunk dictionaries with text and metadata
+        """
+        return self.iter_chunks_with_total(text, metadata)[1]
+
+    def iter_chunks_with_total(self, text: str,
+                               metadata: Dict[str, Any]) -> Tuple[int, Iterator[Dict[str, Any]]]:
+        """
+        Count the chunks of a text, then lazily yield them.
+
+        Chunk boundaries are word offsets, so they are all computed up front;
+        only joining each chunk's text is deferred to iteration.
+
+        Args:
+            text: The full text to chunk
+            metadata: Base metadata to include with each chunk
+
+        Returns:
+            Tuple of (number of chunks, iterator of chunk dictionaries)
+        """
+        words, bounds = self._chunk_bounds(text)
+        return len(bounds), self._build_chunks(words, bounds, dict(metadata))
+
+    def _chunk_bounds(self, text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """Split text into words and the [start, end) word offsets of each chunk."""
         # Clean and normalize text
         text = self._clean_text(text)
 
-        # Split into sentences for better chunking
-        sentences = self._split_into_sentences(text)
-
-        # Create chunks
-        chunks = []
-        current_chunk = []
-        current_word_count = 0
-        chunk_id = 1
-
-        for sentence in sentences:
-            sentence_words = sentence.split()
-            sentence_word_count = len(sentence_words)
-
-            # If adding this sentence would exceed chunk size and we have content
-            if current_word_count + sentence_word_count > self.chunk_size and current_chunk:
-                # Create chunk from current content
-                chunk_text = ' '.join(current_chunk)
-                chunk_metadata = metadata.copy()
-                chunk_metadata.update({
+        # Fast path: text that fits in one chunk needs no sentence splitting
+        words = text.split()
+        if len(words) <= self.chunk_size:
+            return words, [(0, len(words))] if words else []
+
+        # Find sentence boundaries as word offsets; chunking is then integer arithmetic
+        if text_to_sentences is not None:
+            # blingfire picks its own boundaries, so tokenize sentence by sentence
+            words = []
+            sentence_ends = []
+            for sentence in self._split_into_sentences(text):
+                words.extend(sentence.split())
+                sentence_ends.append(len(words))
+        else:
+            sentence_ends = _sentence_ends(words)
+
+        return words, list(_chunk_boundaries(sentence_ends, self.chunk_size, self.chunk_overlap))
+
+    @staticmethod
+    def _build_chunks(words: List[str], bounds: List[Tuple[int, int]],
+                      base_metadata: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Yield a chunk dictionary for each [start, end) word range."""
+        for chunk_id, (start, end) in enumerate(bounds, start=1):
+            yield {
+                'text': ' '.join(words[start:end]),
+                'metadata': {
+                    **base_metadata,
                     'chunk_id': chunk_id,
-                    'word_count': current_word_count,
+                    'word_count': end - start,
                     'section': f"chunk_{chunk_id:03d}"
-                })
-
-                chunks.append({
-                    'text': chunk_text,
-                    'metadata': chunk_metadata
-                })
-
-                # Start new chunk with overlap
-                overlap_words = self._get_overlap_words(current_chunk, self.chunk_overlap)
-                current_chunk = overlap_words + sentence_words
-                current_word_count = len(current_chunk)
-                chunk_id += 1
-            else:
-                # Add sentence to current chunk
-                current_chunk.extend(sentence_words)
-                current_word_count += sentence_word_count
-
-        # Add final chunk if there's remaining content
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
-            chunk_metadata = metadata.copy()
-            chunk_metadata.update({
-                'chunk_id': chunk_id,
-                'word_count': current_word_count,
-                'section': f"chunk_{chunk_id:03d}"
-            })
-
-            chunks.append({
-                'text': chunk_text,
-                'metadata': chunk_metadata
-            })
-
-        # Update total_chunks in all chunks
-        for chunk in chunks:
-            chunk['metadata']['total_chunks'] = len(chunks)
-
-        return chunks
+                }
+            }
 
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text."""
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
+        text = _WS_RE.sub(' ', text.strip())
         # Remove excessive newlines
-        text = re.sub(r'\n\s*\n', '\n\n', text)
+        text = _NL_RE.sub('\n\n', text)
         return text
 
     def _split_into_sentences(self, text: str) -> List[str]:
         """Split text into sentences."""
-        # Simple sentence splitting - can be enhanced with NLTK if needed
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        if text_to_sentences is not None:
+            sentences = text_to_sentences(text).splitlines()
+        else:
+            # Simple regex sentence splitting when blingfire isn't installed
+            sentences = _SENT_RE.split(text)
         # Filter out empty sentences
         sentences = [s.strip() for s in sentences if s.strip()]
         return sentences
 
-    def _get_overlap_words(self, words: List[str], overlap_count: int) -> List[str]:
-        """Get the last N words for overlap."""
-        return words[-overlap_count:] if len(words) >= overlap_count else words
-
 
 def chunk_document(text: str, document_name: str, source_file: str,
                   chunk_size: int = 200) -> List[Dict[str, Any]]:
@@ -138,3 +189,51 @@ def chunk_document(text: str, document_name: str, source_file: str,
     }
 
     return chunker.chunk_text(text, metadata)
+
+
+def iter_document_chunks(text: str, document_name: str, source_file: str,
+                         chunk_size: int = 200) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of chunk_document that yields chunks as they are built.
+
+    Args:
+        text: Document text
+        document_name: Name of the document
+        source_file: Source filename
+        chunk_size: Words per chunk
+
+    Returns:
+        Iterator of chunk dictionaries (without 'total_chunks')
+    """
+    chunker = DocumentChunker(chunk_size=chunk_size)
+
+    metadata = {
+        'document_name': document_name,
+        'source_file': source_file
+    }
+
+    return chunker.iter_chunks(text, metadata)
+
+
+def iter_document_chunks_with_total(text: str, document_name: str, source_file: str,
+                                    chunk_size: int = 200) -> Tuple[int, Iterator[Dict[str, Any]]]:
+    """
+    Like iter_document_chunks, but also returns the chunk count before streaming.
+
+    Args:
+        text: Document text
+        document_name: Name of the document
+        source_file: Source filename
+        chunk_size: Words per chunk
+
+    Returns:
+        Tuple of (number of chunks, iterator of chunk dictionaries without 'total_chunks')
+    """
+    chunker = DocumentChunker(chunk_size=chunk_size)
+
+    metadata = {
+        'document_name': document_name,
+        'source_file': source_file
+    }
+
+    return chunker.iter_chunks_with_total(text, metadata)
@@ -1,11 +1,15 @@
 """
-Local LLM generator for RAG system using GPT4All.
+Local LLM generator for RAG system using GPT4All, with an optional vLLM backend.
 Provides answer generation based on retrieved document chunks.
 """
 
+import asyncio
 import os
+import re
+import threading
 import time
-from typing import List, Dict, Any, Optional
+import uuid
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from gpt4all import GPT4All
 import logging
 
@@ -13,13 +17,58 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Model served when LLM_BACKEND=vllm and VLLM_MODEL isn't set. Decode is bound by
+# weight reads, so serve a 4-bit weight-only (w4a16) checkpoint with fused dequant-GEMM kernels
+DEFAULT_VLLM_MODEL = "neuralmagic/Meta-Llama-3.1-8B-Instruct-quantized.w4a16"
+
+# GPT4All models: Q4_K_M runs as fast as q4_0 on llama.cpp CPU kernels with better quality.
+# GPT4All's catalog only carries Q4_0 builds, so the default is sideloaded from its own URL
+# and must stay in the same 3B class as the fallback to keep decode speed
+DEFAULT_GPT4ALL_MODEL = "Llama-3.2-3B-Instruct-Q4_K_M.gguf"
+FALLBACK_GPT4ALL_MODEL = "orca-mini-3b-gguf2-q4_0.gguf"
+
+# Download locations for models that aren't in GPT4All's catalog
+GPT4ALL_MODEL_URLS = {
+    DEFAULT_GPT4ALL_MODEL: "https://huggingface.co/bartowski/Llama-3.2-3B-Instruct-GGUF/resolve/main/"
+                           "Llama-3.2-3B-Instruct-Q4_K_M.gguf",
+}
+
+# llama.cpp settings: one thread per physical core avoids oversubscribing SMT siblings
+LLM_THREADS = max(1, (os.cpu_count() or 2) // 2)
+LLM_CONTEXT_SIZE = 4096
+LLM_PROMPT_BATCH = 512
+
+# Overlong answers are cut at the last sentence terminator within this many characters
+ANSWER_TRIM_CHARS = 1500
+_SENTENCE_END_RE = re.compile(r'[.!?]')
+
+# Retrieved context is cut to this many tokens so prefill stays bounded
+DEFAULT_MAX_CONTEXT_TOKENS = 2048
+# GPT4All doesn't expose its tokenizer; English text averages about 4 characters a token
+CHARS_PER_TOKEN = 4
+
+# RAG prompt pieces, kept as constants so the shared prefix is byte-identical on every call
+_PROMPT_PREFIX = """You are a helpful AI assistant that answers questions based on provided document context.
+
+INSTRUCTIONS:
+- Answer the question using ONLY the information from the provided context
+- Be concise but comprehensive
+- If the context doesn't contain enough information to answer fully, say so
+- Cite specific document names when relevant
+- Keep your answer focused and relevant
+
+CONTEXT:
+"""
+_PROMPT_MID = "\n\nQUESTION: "
+_PROMPT_SUFFIX = "\n\nANSWER:"
+
 class LocalLLMGenerator:
     """
     Local LLM generator using GPT4All for answer generation.
     Downloads and manages local LLM models for offline inference.
     """
 
-    def __init__(self, model_name: str = "orca-mini-3b-gguf2-q4_0.gguf", model_path: str = None):
+    def __init__(self, model_name: str = DEFAULT_GPT4ALL_MODEL, model_path: str = None):
         """
         Initialize the local LLM generator.
 
@@ -32,13 +81,18 @@ class LocalLLMGenerator:
         os.makedirs(self.model_path, exist_ok=True)
 
         self.model = None
+        # GPT4All models are not safe to call from several threads at once
+        self._generate_lock = threading.Lock()
+        # Queries allowed into the model at once; the rest wait on the event loop
+        # instead of each holding a default-executor thread blocked on the lock
+        self.slots = asyncio.Semaphore(1)
         self._load_model()
 
     def _load_model(self):
         """Load the GPT4All model."""
         try:
             logger.info(f"Loading GPT4All model: {self.model_name}")
-            self.model = GPT4All(self.model_name, model_path=self.model_path)
+            self.model = self._open_model()
 
             # Warm up the model
             logger.info("Warming up the model...")
@@ -50,16 +104,37 @@ class LocalLLMGenerator:
             # Fallback to a smaller model if available
             try:
                 logger.info("Trying fallback model...")
-                self.model_name = "ggml-model-gpt4all-falcon-q4_0.bin"
-                self.model = GPT4All(self.model_name, model_path=self.model_path)
+                self.model_name = FALLBACK_GPT4ALL_MODEL
+                self.model = self._open_model()
                 self.model.generate("Hello", max_tokens=10, temp=0.1)
                 logger.info("Fallback model loaded successfully!")
             except Exception as e2:
                 logger.error(f"Fallback model also failed: {e2}")
                 raise RuntimeError("Could not load any GPT4All model. Please check your installation.")
 
-    def generate_answer(self, query: str, context_chunks: List[Dict[str, Any]],
-                       max_tokens: int = 256, temperature: float = 0.7) -> Dict[str, Any]:
+    def _open_model(self) -> GPT4All:
+        """
+        Open self.model_name with the llama.cpp threading and context settings.
+
+        Sideloaded models are fetched once from GPT4ALL_MODEL_URLS and then opened
+        with allow_download=False, so startup never queries GPT4All's catalog for them.
+        """
+        url = GPT4ALL_MODEL_URLS.get(self.model_name)
+        if url is not None and not os.path.exists(os.path.join(self.model_path, self.model_name)):
+            logger.info(f"Downloading {self.model_name} from {url}")
+            GPT4All.download_model(self.model_name, self.model_path, url=url)
+
+        return GPT4All(
+            self.model_name,
+            model_path=self.model_path,
+            allow_download=url is None,
+            n_threads=LLM_THREADS,
+            n_ctx=LLM_CONTEXT_SIZE
+        )
+
+    async def generate_answer(self, query: str, context_chunks: List[Dict[str, Any]],
+                              max_tokens: int = 256, temperature: float = 0.7,
+                              max_context_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS) -> Dict[str, Any]:
         """
         Generate an answer based on the query and retrieved context chunks.
 
@@ -68,6 +143,7 @@ class LocalLLMGenerator:
             context_chunks: List of retrieved document chunks with metadata
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature (0.0 to 1.0)
+            max_context_tokens: Token budget for the retrieved context in the prompt
 
         Returns:
             Dictionary containing answer, sources, and metadata
@@ -75,36 +151,14 @@ class LocalLLMGenerator:
         if not self.model:
             raise RuntimeError("Model not loaded. Cannot generate answers.")
 
-        # Extract relevant information from chunks
-        context_texts = []
-        source_documents = set()
-
-        for chunk in context_chunks:
-            context_texts.append(chunk['text'])
-            metadata = chunk.get('metadata', {})
-            doc_name = metadata.get('document_name', 'Unknown')
-            source_documents.add(doc_name)
-
-        # Combine context into a single string
-        context = "\n\n".join(context_texts)
-        sources = sorted(list(source_documents))
-
-        # Create the prompt
-        prompt = self._create_rag_prompt(query, context)
+        prompt, sources, chunks_used = self._prepare_prompt(query, context_chunks, max_context_tokens)
 
         try:
             logger.info(f"Generating answer for query: {query[:50]}...")
 
             # Generate response
             start_time = time.time()
-            response = self.model.generate(
-                prompt,
-                max_tokens=max_tokens,
-                temp=temperature,
-                top_k=40,
-                top_p=0.9,
-                repeat_penalty=1.1
-            )
+            response = await self._generate(prompt, max_tokens, temperature)
             generation_time = time.time() - start_time
 
             # Clean up the response
@@ -113,13 +167,13 @@ class LocalLLMGenerator:
             result = {
                 "answer": answer,
                 "sources": sources,
-                "context_chunks_used": len(context_chunks),
+                "context_chunks_used": chunks_used,
                 "generation_time_seconds": round(generation_time, 2),
                 "model": self.model_name,
                 "query": query
             }
 
-            logger.info(f"Generated answer in {generation_time:.2f}s using {len(context_chunks)} chunks")
+            logger.info(f"Generated answer in {generation_time:.2f}s using {chunks_used} chunks")
             return result
 
         except Exception as e:
@@ -128,29 +182,159 @@ class LocalLLMGenerator:
                 "answer": "I apologize, but I encountered an error while generating an answer. Please try again.",
                 "sources": sources,
                 "error": str(e),
-                "context_chunks_used": len(context_chunks),
+                "context_chunks_used": chunks_used,
                 "query": query
             }
 
-    def _create_rag_prompt(self, query: str, context: str) -> str:
-        """Create a RAG-style prompt for the LLM."""
-        prompt = f"""You are a helpful AI assistant that answers questions based on provided document context.
+    async def stream_answer(self, query: str, context_chunks: List[Dict[str, Any]],
+                            max_tokens: int = 256, temperature: float = 0.7,
+                            max_context_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an answer token by token as the model produces it.
 
-CONTEXT:
-{context}
+        Args:
+            query: User's question
+            context_chunks: List of retrieved document chunks with metadata
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_context_tokens: Token budget for the retrieved context in the prompt
 
-QUESTION: {query}
+        Yields:
+            {"token": text} for each generated piece, then a final dictionary
+            with the same fields as generate_answer's result
+        """
+        if not self.model:
+            raise RuntimeError("Model not loaded. Cannot generate answers.")
 
-INSTRUCTIONS:
-- Answer the question using ONLY the information from the provided context
-- Be concise but comprehensive
-- If the context doesn't contain enough information to answer fully, say so
-- Cite specific document names when relevant
-- Keep your answer focused and relevant
+        prompt, sources, chunks_used = self._prepare_prompt(query, context_chunks, max_context_tokens)
+
+        logger.info(f"Streaming answer for query: {query[:50]}...")
+        start_time = time.time()
+        pieces = []
+        async for token in self._stream(prompt, max_tokens, temperature):
+            pieces.append(token)
+            yield {"token": token}
+        generation_time = time.time() - start_time
+
+        logger.info(f"Streamed answer in {generation_time:.2f}s using {chunks_used} chunks")
+        yield {
+            "answer": self._clean_response("".join(pieces)),
+            "sources": sources,
+            "context_chunks_used": chunks_used,
+            "generation_time_seconds": round(generation_time, 2),
+            "model": self.model_name,
+            "query": query
+        }
+
+    def _prepare_prompt(self, query: str, context_chunks: List[Dict[str, Any]],
+                        max_context_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS) -> Tuple[str, List[str], int]:
+        """
+        Build the RAG prompt from as many chunks as fit the context token budget.
+
+        Chunks are taken in retrieval (relevance) order and the last one that
+        doesn't fit is truncated to the remaining budget.
+
+        Returns:
+            The prompt, the sorted source document names, and the number of chunks used
+        """
+        selected = []
+        remaining = max_context_tokens
+        for chunk in context_chunks:
+            if remaining <= 0:
+                break
+            text, n_tokens = self._truncate_to_tokens(chunk['text'], remaining)
+            selected.append({**chunk, 'text': text})
+            remaining -= n_tokens
+
+        # Extract relevant information from chunks
+        context_texts = []
+        source_documents = set()
+
+        # Stable document order makes repeated retrievals produce identical prompt prefixes
+        for chunk in sorted(selected, key=self._context_sort_key):
+            context_texts.append(chunk['text'])
+            metadata = chunk.get('metadata', {})
+            doc_name = metadata.get('document_name', 'Unknown')
+            source_documents.add(doc_name)
+
+        # Combine context into a single string
+        context = "\n\n".join(context_texts)
+        sources = sorted(list(source_documents))
+
+        return self._create_rag_prompt(query, context), sources, len(selected)
+
+    def _truncate_to_tokens(self, text: str, max_tokens: int) -> Tuple[str, int]:
+        """Cut text to at most max_tokens tokens; returns the text and its token count."""
+        n_tokens = -(-len(text) // CHARS_PER_TOKEN)
+        if n_tokens <= max_tokens:
+            return text, n_tokens
+        return text[:max_tokens * CHARS_PER_TOKEN], max_tokens
+
+    def _generate_kwargs(self, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """Sampling settings shared by blocking and streaming GPT4All calls."""
+        return {
+            "max_tokens": max_tokens,
+            "temp": temperature,
+            "top_k": 40,
+            "top_p": 0.9,
+            "repeat_penalty": 1.1,
+            "n_batch": LLM_PROMPT_BATCH
+        }
+
+    async def _generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Run GPT4All in a worker thread so the event loop stays responsive."""
+        def generate():
+            with self._generate_lock:
+                return self.model.generate(prompt, **self._generate_kwargs(max_tokens, temperature))
+
+        return await asyncio.to_thread(generate)
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        """Run streaming GPT4All generation in a worker thread and relay tokens to the event loop."""
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        # Set when the consumer goes away (e.g. client disconnect) so decoding stops early
+        stop = threading.Event()
+        done = object()
 
-ANSWER:"""
+        def produce():
+            try:
+                with self._generate_lock:
+                    for token in self.model.generate(prompt, streaming=True,
+                                                     **self._generate_kwargs(max_tokens, temperature)):
+                        if stop.is_set():
+                            break
+                        loop.call_soon_threadsafe(tokens.put_nowait, token)
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, done)
+
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        try:
+            while True:
+                token = await tokens.get()
+                if token is done:
+                    break
+                yield token
+            # Surface any exception raised in the worker thread
+            await producer
+        finally:
+            stop.set()
+
+    @staticmethod
+    def _context_sort_key(chunk: Dict[str, Any]) -> tuple:
+        """Order context chunks by document and position within it."""
+        metadata = chunk.get('metadata', {})
+        chunk_id = metadata.get('chunk_id', 0)
+        return (str(metadata.get('document_name', '')), chunk_id if isinstance(chunk_id, int) else 0)
 
-        return prompt
+    def _create_rag_prompt(self, query: str, context: str) -> str:
+        """
+        Create a RAG-style prompt for the LLM.
+
+        The fixed instructions come first and never depend on the query, so the
+        longest possible prefix is shared across requests for prefix caching.
+        """
+        return _PROMPT_PREFIX + context + _PROMPT_MID + query + _PROMPT_SUFFIX
 
     def _clean_response(self, response: str) -> str:
         """Clean up the LLM response."""
@@ -163,18 +347,10 @@ ANSWER:"""
 
         # Limit to reasonable length (first coherent response)
         if len(response) > 2000:
-            # Try to cut at a sentence boundary
-            sentences = response.split('.')
-            truncated = []
-            length = 0
-            for sentence in sentences:
-                if length + len(sentence) > 1500:
-                    break
-                truncated.append(sentence + '.')
-                length += len(sentence)
-
-            if truncated:
-                response = ' '.join(truncated)
+            # Try to cut at a sentence boundary; only the kept prefix is scanned
+            ends = [match.end() for match in _SENTENCE_END_RE.finditer(response, 0, ANSWER_TRIM_CHARS)]
+            if ends:
+                response = response[:ends[-1]]
 
         return response
 
@@ -187,12 +363,138 @@ ANSWER:"""
         }
 
 
+class VLLMGenerator(LocalLLMGenerator):
+    """
+    LLM generator backed by a vLLM AsyncLLMEngine.
+    Concurrent queries are continuously batched by the engine instead of
+    being serialized on a single model call.
+    """
+
+    def __init__(self, model_name: str = None, max_num_seqs: int = 32):
+        """
+        Initialize the vLLM generator.
+
+        Args:
+            model_name: HuggingFace model id to serve (defaults to $VLLM_MODEL)
+            max_num_seqs: Maximum sequences batched together by the engine
+        """
+        self.model_name = model_name or os.environ.get("VLLM_MODEL", DEFAULT_VLLM_MODEL)
+        self.model_path = None
+        self.max_num_seqs = max_num_seqs
+        self.model = None
+        # Admit as many queries as the engine batches; more would only queue inside it
+        self.slots = asyncio.Semaphore(max_num_seqs)
+        self._load_model()
+
+    def _load_model(self):
+        """Start the vLLM engine."""
+        # vLLM needs a GPU and is an optional dependency, so import it lazily
+        from vllm import AsyncEngineArgs, AsyncLLMEngine
+        from transformers import AutoTokenizer
+
+        engine_kwargs = {}
+        kv_connector = os.environ.get("VLLM_KV_CONNECTOR")
+        if kv_connector:
+            # Offload KV blocks of retrieved chunks to an external store (e.g. LMCache,
+            # which can blend per-chunk caches) so chunk prefill is reused across queries
+            from vllm.config import KVTransferConfig
+            engine_kwargs["kv_transfer_config"] = KVTransferConfig(
+                kv_connector=kv_connector,
+                kv_role="kv_both"
+            )
+
+        # Quantization is read from the checkpoint config unless forced, e.g. VLLM_QUANTIZATION=fp8
+        # with VLLM_KV_CACHE_DTYPE=fp8 for an FP8 checkpoint on Ada/Hopper GPUs
+        quantization = os.environ.get("VLLM_QUANTIZATION") or None
+
+        logger.info(f"Starting vLLM engine: {self.model_name}")
+        self.model = AsyncLLMEngine.from_engine_args(AsyncEngineArgs(
+            model=self.model_name,
+            max_num_seqs=self.max_num_seqs,
+            quantization=quantization,
+            kv_cache_dtype=os.environ.get("VLLM_KV_CACHE_DTYPE", "auto"),
+            # Reuse KV cache for the shared instruction prefix across queries
+            enable_prefix_caching=True,
+            **engine_kwargs
+        ))
+        # Same tokenizer as the engine, used to hold the context to its token budget
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        logger.info("vLLM engine ready!")
+
+    def _truncate_to_tokens(self, text: str, max_tokens: int) -> Tuple[str, int]:
+        """Cut text to at most max_tokens model tokens; returns the text and its token count."""
+        token_ids = self.tokenizer.encode(text, add_special_tokens=False)
+        if len(token_ids) <= max_tokens:
+            return text, len(token_ids)
+        return self.tokenizer.decode(token_ids[:max_tokens]), max_tokens
+
+    def _sampling_params(self, max_tokens: int, temperature: float):
+        """Sampling settings matching the GPT4All backend."""
+        from vllm import SamplingParams
+
+        return SamplingParams(
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_k=40,
+            top_p=0.9,
+            repetition_penalty=1.1
+        )
+
+    async def _generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Submit the prompt to the engine and wait for the finished output."""
+        sampling_params = self._sampling_params(max_tokens, temperature)
+
+        final_output = None
+        async for output in self.model.generate(prompt, sampling_params, request_id=uuid.uuid4().hex):
+            final_output = output
+        return final_output.outputs[0].text
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        """Yield the newly decoded text from each engine step."""
+        sampling_params = self._sampling_params(max_tokens, temperature)
+
+        sent = 0
+        async for output in self.model.generate(prompt, sampling_params, request_id=uuid.uuid4().hex):
+            text = output.outputs[0].text
+            if len(text) > sent:
+                yield text[sent:]
+                sent = len(text)
+
+# Seconds to wait after a failed model load before trying again; a load can mean a multi-GB download
+GENERATOR_RETRY_SECONDS = 300
+
 # Global generator instance for reuse
 _generator_instance = None
+_generator_lock = threading.Lock()
+_generator_failure: Optional[Tuple[float, Exception]] = None
 
 def get_generator() -> LocalLLMGenerator:
-    """Get or create the global generator instance."""
-    global _generator_instance
-    if _generator_instance is None:
-        _generator_instance = LocalLLMGenerator()
+    """
+    Get or create the global generator instance.
+
+    The backend is chosen with the LLM_BACKEND environment variable:
+    "gpt4all" (default, CPU) or "vllm" (GPU, continuous batching).
+    Loading blocks, so async callers should run this in a worker thread. The
+    lock makes concurrent first callers share one load, and after a failure
+    callers get the same error until GENERATOR_RETRY_SECONDS have passed.
+    """
+    global _generator_instance, _generator_failure
+    if _generator_instance is not None:
+        return _generator_instance
+
+    with _generator_lock:
+        if _generator_instance is None:
+            if _generator_failure is not None:
+                failed_at, error = _generator_failure
+                if time.monotonic() - failed_at < GENERATOR_RETRY_SECONDS:
+                    raise RuntimeError(f"LLM unavailable, last load failed: {error}") from error
+            try:
+                if os.environ.get("LLM_BACKEND", "gpt4all").lower() == "vllm":
+                    _generator_instance = VLLMGenerator()
+                else:
+                    _generator_instance = LocalLLMGenerator()
+            except Exception as e:
+                _generator_failure = (time.monotonic(), e)
+                raise
+            _generator_failure = None
     return _generator_instance
@@ -1,19 +1,141 @@
 """
 Vector store implementation using ChromaDB with HuggingFace embeddings.
-Provides client-isolated document storage and retrieval.
+Provides client-isolated document storage and retrieval; nearest-neighbour
+search runs on an in-process FAISS HNSW index persisted beside the collection.
 """
 
+import functools
+import json
 import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 import chromadb
+import faiss
+import numpy as np
+import torch
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional
+from contextlib import closing
+from typing import List, Dict, Any, Optional, Tuple
 import hashlib
 
+try:
+    # Optional lexical reranker for the second retrieval stage
+    from rank_bm25 import BM25Okapi
+except ImportError:
+    BM25Okapi = None
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_GPU_BATCH_SIZE = 256
+
+# FAISS HNSW parameters; vectors are normalized, so inner product is cosine similarity
+FAISS_HNSW_M = 16
+FAISS_EF_CONSTRUCTION = 100
+# Default HNSW search breadth; ample recall for the typical top_k <= 5, overridable per query
+FAISS_EF_SEARCH = 32
+FAISS_INDEX_FILE = "faiss.index"
+# One JSON-encoded Chroma id per line, in FAISS label order; appended to as the index grows
+FAISS_IDS_FILE = "faiss_ids.jsonl"
+# Seconds an updated index may stay unsaved, so bursts of small ingests share one index write
+FAISS_SAVE_DELAY = float(os.environ.get("FAISS_SAVE_DELAY", 2.0))
+
+# Small SQLite table of unique document names, so listing doesn't scan every chunk
+DOCS_DB_FILE = "docs.db"
+
+# Hits at least this similar to a better-ranked hit (e.g. overlapping chunks) are dropped
+DEDUP_SIMILARITY = 0.9
+# Extra candidates fetched per requested result so top_k survives deduplication
+DEDUP_CANDIDATE_FACTOR = 2
+
+# ANN candidates fetched per requested result for BM25 reranking
+RERANK_CANDIDATE_FACTOR = 4
+_TOKEN_RE = re.compile(r'\w+')
+
+# Open stores kept per process; each holds a Chroma handle and a loaded FAISS index
+STORE_CACHE_SIZE = 64
+
+# Per-client-directory locks: FAISS indexes aren't safe to search while being
+# updated, and concurrent ingests mustn't overwrite each other's index files
+_index_locks: Dict[str, threading.RLock] = {}
+_index_locks_guard = threading.Lock()
+
+def _get_index_lock(client_dir: str) -> threading.RLock:
+    """Get the lock guarding the FAISS index stored in client_dir."""
+    with _index_locks_guard:
+        lock = _index_locks.get(client_dir)
+        if lock is None:
+            lock = _index_locks[client_dir] = threading.RLock()
+        return lock
+
+# Bounded like the store cache: clients are only opened by stores, so both evict together
+@functools.lru_cache(maxsize=STORE_CACHE_SIZE)
+def _get_chroma_client(path: str) -> "chromadb.ClientAPI":
+    """Get the process-wide ChromaDB client persisted at path."""
+    return chromadb.PersistentClient(
+        path=path,
+        settings=Settings(anonymized_telemetry=False)
+    )
+
+# On CPU, embed with the model's int8-quantized ONNX export through ONNX Runtime.
+# EMBEDDING_BACKEND=torch restores the FP32 PyTorch model; output stays 384-dim either way.
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "onnx")
+EMBEDDING_ONNX_FILE = os.environ.get("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+# Shared embedder; loading the model dominates per-request latency otherwise
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_embedder() -> SentenceTransformer:
+    """Get or lazily load the process-wide sentence transformer."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                if torch.cuda.is_available():
+                    # FP16 halves memory traffic; MiniLM embeddings are unaffected in practice
+                    _embedder = SentenceTransformer(EMBEDDING_MODEL, device="cuda").half()
+                elif EMBEDDING_BACKEND == "onnx":
+                    _embedder = SentenceTransformer(
+                        EMBEDDING_MODEL,
+                        backend="onnx",
+                        model_kwargs={"file_name": EMBEDDING_ONNX_FILE}
+                    )
+                else:
+                    _embedder = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    return _embedder
+
+def index_version(client_id: str, persist_directory: str = "vectorstores") -> Tuple[int, int]:
+    """
+    Version of a client's searchable data, visible to every worker process.
+
+    The FAISS index file is replaced on every delete and, within
+    FAISS_SAVE_DELAY, after every add, so its inode and mtime change whenever
+    cached query results or listings may have gone stale; (0, 0) means the
+    client has no index yet.
+    """
+    try:
+        stat = os.stat(os.path.join(persist_directory, client_id, FAISS_INDEX_FILE))
+    except FileNotFoundError:
+        return (0, 0)
+    return (stat.st_ino, stat.st_mtime_ns)
+
+def _new_faiss_index() -> faiss.Index:
+    """Create an empty HNSW index over normalized embeddings."""
+    index = faiss.IndexHNSWFlat(EMBEDDING_DIM, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = FAISS_EF_CONSTRUCTION
+    return index
+
 class ClientVectorStore:
     """
     Client-isolated vector store using ChromaDB.
     Each client gets their own ChromaDB collection for complete data isolation.
+    ChromaDB is the durable store for texts and metadata, while searches go
+    through a FAISS index whose positions map back to Chroma ids.
     """
 
     def __init__(self, client_id: str, persist_directory: str = "vectorstores"):
@@ -31,26 +153,160 @@ class ClientVectorStore:
         self.client_dir = os.path.join(persist_directory, client_id)
         os.makedirs(self.client_dir, exist_ok=True)
 
-        # Initialize ChromaDB client
-        self.chroma_client = chromadb.PersistentClient(
-            path=self.client_dir,
-            settings=Settings(anonymized_telemetry=False)
-        )
+        # Shared ChromaDB client for this directory
+        self.chroma_client = _get_chroma_client(self.client_dir)
 
-        # Initialize sentence transformer for embeddings
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
+        # Shared sentence transformer for embeddings
+        self.embedder = get_embedder()
+        self.batch_size = EMBEDDING_GPU_BATCH_SIZE if self.embedder.device.type == "cuda" else EMBEDDING_BATCH_SIZE
 
         # Get or create collection for this client
         collection_name = f"client_{client_id}_docs"
         try:
             self.collection = self.chroma_client.get_collection(collection_name)
         except (ValueError, Exception):
-            # Collection doesn't exist, create it
+            # Collection doesn't exist, create it; embeddings are normalized, so
+            # inner product is cosine similarity, matching the FAISS index metric
             self.collection = self.chroma_client.create_collection(
                 name=collection_name,
-                metadata={"client_id": client_id}
+                metadata={"hnsw:space": "ip", "client_id": client_id}
             )
 
+        self.index_path = os.path.join(self.client_dir, FAISS_INDEX_FILE)
+        self.ids_path = os.path.join(self.client_dir, FAISS_IDS_FILE)
+        self._index_mtime = None
+        self._saved_id_count = 0
+        self._ids_size = 0
+        self._last_save = 0.0
+        self._index_dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._index_lock = _get_index_lock(self.client_dir)
+        with self._index_lock:
+            self._load_index()
+
+        self.docs_db_path = os.path.join(self.client_dir, DOCS_DB_FILE)
+        self._init_docs_db()
+
+    def _docs_db(self) -> sqlite3.Connection:
+        """Open a connection to the document-name table; callers close it."""
+        return sqlite3.connect(self.docs_db_path)
+
+    def _init_docs_db(self) -> None:
+        """Create the document-name table, backfilling it from Chroma on first use."""
+        with closing(self._docs_db()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS docs(name TEXT PRIMARY KEY)")
+            populated = conn.execute("SELECT 1 FROM docs LIMIT 1").fetchone() is not None
+            if not populated and self.collection.count() > 0:
+                results = self.collection.get(include=['metadatas'])
+                self._record_documents(conn, results['metadatas'])
+
+    @staticmethod
+    def _record_documents(conn: sqlite3.Connection, metadatas: List[Dict[str, Any]]) -> None:
+        """Add the document names found in chunk metadata to the table."""
+        names = {metadata['document_name'] for metadata in metadatas if 'document_name' in metadata}
+        conn.executemany("INSERT OR IGNORE INTO docs(name) VALUES (?)", [(name,) for name in names])
+
+    def _load_index(self) -> None:
+        """Load the FAISS index from disk, rebuilding it from Chroma if missing or out of sync."""
+        index = None
+        faiss_ids: List[str] = []
+        if os.path.exists(self.index_path) and os.path.exists(self.ids_path):
+            self._index_mtime = os.stat(self.index_path).st_mtime_ns
+            index = faiss.read_index(self.index_path)
+            with open(self.ids_path, "r") as f:
+                data = f.read()
+            # A line still being appended by another worker has no newline yet; skip it
+            faiss_ids = [json.loads(line) for line in data.split("\n")[:-1]]
+            self._ids_size = len(data.encode())
+
+        if index is None or index.ntotal != self.collection.count() or len(faiss_ids) < index.ntotal:
+            index, faiss_ids = self._build_index_from_collection()
+            self._set_index(index, faiss_ids)
+            self._saved_id_count = 0
+            self._save_index()
+        else:
+            self._set_index(index, faiss_ids)
+            self._saved_id_count = len(faiss_ids)
+            self._index_dirty = False
+
+    def _set_index(self, index: faiss.Index, faiss_ids: List[str]) -> None:
+        """Make index and its id mapping the in-memory search state; caller holds self._index_lock."""
+        self.index = index
+        self._faiss_ids = faiss_ids
+        self._faiss_id_set = set(faiss_ids)
+
+    def _build_index_from_collection(self):
+        """Index every embedding already stored in the Chroma collection."""
+        index = _new_faiss_index()
+        results = self.collection.get(include=['embeddings'])
+        faiss_ids = list(results['ids'])
+        if faiss_ids:
+            embeddings = np.ascontiguousarray(results['embeddings'], dtype=np.float32)
+            faiss.normalize_L2(embeddings)
+            index.add(embeddings)
+        return index, faiss_ids
+
+    def _save_index(self) -> None:
+        """
+        Persist the index and its id mapping; caller holds self._index_lock.
+
+        The id list is written first: it only ever grows, so a reader that sees
+        the new ids with the old index still resolves every label correctly.
+        Ids added since the last save are appended, unless the file was
+        rewritten by someone else since, in which case it is replaced whole.
+        """
+        new_ids = self._faiss_ids[self._saved_id_count:]
+        if (self._saved_id_count and os.path.exists(self.ids_path)
+                and os.stat(self.ids_path).st_size == self._ids_size):
+            with open(self.ids_path, "a") as f:
+                f.write("".join(json.dumps(chunk_id) + "\n" for chunk_id in new_ids))
+        else:
+            tmp_ids_path = self.ids_path + ".tmp"
+            with open(tmp_ids_path, "w") as f:
+                f.write("".join(json.dumps(chunk_id) + "\n" for chunk_id in self._faiss_ids))
+            os.replace(tmp_ids_path, self.ids_path)
+        self._ids_size = os.stat(self.ids_path).st_size
+        self._saved_id_count = len(self._faiss_ids)
+
+        tmp_index_path = self.index_path + ".tmp"
+        faiss.write_index(self.index, tmp_index_path)
+        os.replace(tmp_index_path, self.index_path)
+        self._index_mtime = os.stat(self.index_path).st_mtime_ns
+        self._last_save = time.monotonic()
+        self._index_dirty = False
+
+    def _schedule_save(self) -> None:
+        """
+        Save the updated index now, or within FAISS_SAVE_DELAY of the last save;
+        caller holds self._index_lock.
+
+        Coalescing keeps a stream of single-chunk ingests from rewriting the
+        whole index on every call. The timer thread isn't a daemon, so a
+        pending save still runs when the process exits; if it is lost anyway,
+        the next load sees the index is behind Chroma and rebuilds it.
+        """
+        self._index_dirty = True
+        delay = self._last_save + FAISS_SAVE_DELAY - time.monotonic()
+        if delay <= 0:
+            self._save_index()
+        elif self._save_timer is None:
+            self._save_timer = threading.Timer(delay, self.flush)
+            self._save_timer.start()
+
+    def flush(self) -> None:
+        """Write any index update still waiting for its coalesced save."""
+        with self._index_lock:
+            self._save_timer = None
+            if self._index_dirty:
+                self._save_index()
+
+    def _refresh_index(self) -> None:
+        """Reload the index if another worker has updated it; caller holds self._index_lock."""
+        if not os.path.exists(self.index_path):
+            return
+        if os.stat(self.index_path).st_mtime_ns != self._index_mtime:
+            self._load_index()
+
     def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
         """
         Add text chunks with metadata to the vector store.
@@ -65,29 +321,29 @@ class ClientVectorStore:
         if not texts:
             return
 
-        # Generate embeddings
-        embeddings = self.embedder.encode(texts).tolist()
-
-        # Generate unique IDs for each chunk
-        ids = []
-        for i, metadata in enumerate(metadatas):
-            # Create unique ID based on document name, chunk_id, and content hash
-            content_hash = hashlib.md5(texts[i].encode()).hexdigest()[:8]
-            chunk_id = metadata.get('chunk_id', i)
-            doc_name = metadata.get('document_name', 'unknown')
-            unique_id = f"{doc_name}_{chunk_id}_{content_hash}"
-            ids.append(unique_id)
-
-        # Convert metadata to ChromaDB format (string values only)
-        chroma_metadatas = []
-        for metadata in metadatas:
-            chroma_metadata = {}
-            for key, value in metadata.items():
-                if isinstance(value, (str, int, float, bool)):
-                    chroma_metadata[key] = value
-                else:
-                    chroma_metadata[key] = str(value)
-            chroma_metadatas.append(chroma_metadata)
+        # Generate embeddings in batches; Chroma accepts the numpy array directly
+        embeddings = self.embedder.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).astype(np.float32, copy=False)
+
+        # Unique IDs from document name, chunk_id, and a 4-byte content hash
+        blake2b = hashlib.blake2b
+        ids = [
+            f"{metadata.get('document_name', 'unknown')}_{metadata.get('chunk_id', i)}_"
+            f"{blake2b(text.encode(), digest_size=4).hexdigest()}"
+            for i, (text, metadata) in enumerate(zip(texts, metadatas))
+        ]
+
+        # Convert metadata to ChromaDB format (scalar values, everything else stringified)
+        chroma_metadatas = [
+            {key: value if isinstance(value, (str, int, float, bool)) else str(value)
+             for key, value in metadata.items()}
+            for metadata in metadatas
+        ]
 
         # Add to collection
         self.collection.add(
@@ -97,40 +353,148 @@ class ClientVectorStore:
             ids=ids
         )
 
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        # Saving the index bumps index_version, so docs.db is updated first and
+        # a reader that sees the new version also sees the new documents
+        with closing(self._docs_db()) as conn, conn:
+            self._record_documents(conn, chroma_metadatas)
+
+        # Chroma ignores ids it already holds, so only index the new ones
+        with self._index_lock:
+            self._refresh_index()
+            new_rows = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._faiss_id_set]
+            if new_rows:
+                self.index.add(np.ascontiguousarray(embeddings[new_rows], dtype=np.float32))
+                new_ids = [ids[i] for i in new_rows]
+                self._faiss_ids.extend(new_ids)
+                self._faiss_id_set.update(new_ids)
+                self._schedule_save()
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query string as a normalized vector."""
+        return self.embedder.encode(
+            [query],
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )[0].astype(np.float32, copy=False)
+
+    def search(self, query: str, top_k: int = 5,
+               query_embedding: Optional[np.ndarray] = None,
+               max_similarity: float = DEDUP_SIMILARITY,
+               rerank: bool = True,
+               ef_search: int = FAISS_EF_SEARCH) -> List[Dict[str, Any]]:
         """
         Search for similar documents using semantic similarity.
 
+        Runs in two stages when rerank is set: the ANN index supplies
+        top_k * RERANK_CANDIDATE_FACTOR candidates, which BM25 reorders
+        against the query before the best top_k are returned.
+
         Args:
             query: Search query string
             top_k: Number of top results to return
+            query_embedding: Precomputed embed_query(query) result, if available
+            max_similarity: Drop hits whose cosine similarity to a better-ranked
+                hit reaches this value; 1.0 or more disables deduplication
+            rerank: Rerank ANN candidates with BM25 (skipped if rank_bm25 isn't installed)
+            ef_search: HNSW search breadth; higher improves recall at the cost of speed.
+                Raised to the candidate count when smaller
 
         Returns:
             List of dictionaries containing matched documents with metadata
         """
         # Generate query embedding
-        query_embedding = self.embedder.encode([query]).tolist()[0]
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
 
-        # Search the collection
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            include=['documents', 'metadatas', 'distances']
-        )
+        with self._index_lock:
+            self._refresh_index()
+            if self.index.ntotal == 0:
+                return []
+
+            rerank = rerank and BM25Okapi is not None
+            factor = 1
+            if max_similarity < 1.0:
+                factor = DEDUP_CANDIDATE_FACTOR
+            if rerank:
+                factor = max(factor, RERANK_CANDIDATE_FACTOR)
+
+            # Search the FAISS index; scores are cosine similarities
+            n_candidates = top_k * factor
+            self.index.hnsw.efSearch = max(ef_search, n_candidates)
+            scores, labels = self.index.search(
+                np.asarray(query_embedding, dtype=np.float32).reshape(1, -1),
+                min(n_candidates, self.index.ntotal)
+            )
+            candidates = [(int(label), float(score)) for label, score in zip(labels[0], scores[0]) if label != -1]
+            if max_similarity < 1.0:
+                candidates = self._deduplicate(candidates, max_similarity)
+            if not rerank:
+                candidates = candidates[:top_k]
+            hits = [(self._faiss_ids[label], score) for label, score in candidates]
+        if not hits:
+            return []
+
+        # Hydrate texts and metadata from Chroma by id
+        results = self.collection.get(ids=[chunk_id for chunk_id, _ in hits],
+                                      include=['documents', 'metadatas'])
+        rows = {
+            chunk_id: (doc, metadata)
+            for chunk_id, doc, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+        }
 
         # Format results
         formatted_results = []
-        if results['documents'] and results['metadatas']:
-            for i, (doc, metadata) in enumerate(zip(results['documents'][0], results['metadatas'][0])):
-                result = {
-                    'text': doc,
-                    'metadata': metadata,
-                    'score': 1.0 - results['distances'][0][i] if results['distances'] else 0.0
-                }
-                formatted_results.append(result)
+        for chunk_id, score in hits:
+            if chunk_id not in rows:
+                continue
+            doc, metadata = rows[chunk_id]
+            result = {
+                'text': doc,
+                'metadata': metadata,
+                'score': score
+            }
+            formatted_results.append(result)
+
+        if rerank:
+            formatted_results = self._rerank_bm25(query, formatted_results)[:top_k]
 
         return formatted_results
 
+    @staticmethod
+    def _rerank_bm25(query: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Order results by BM25 relevance to the query, adding each 'bm25_score'.
+
+        The sort is stable, so ties (e.g. no shared terms) keep the ANN order.
+        """
+        if not results:
+            return results
+
+        bm25 = BM25Okapi([_TOKEN_RE.findall(result['text'].lower()) for result in results])
+        bm25_scores = bm25.get_scores(_TOKEN_RE.findall(query.lower()))
+        for result, bm25_score in zip(results, bm25_scores):
+            result['bm25_score'] = float(bm25_score)
+        return sorted(results, key=lambda result: result['bm25_score'], reverse=True)
+
+    def _deduplicate(self, candidates: List[tuple], max_similarity: float) -> List[tuple]:
+        """
+        Greedily keep candidates, best first, that aren't near-duplicates of one already kept.
+
+        Uses the vectors stored in the FAISS index, so no texts are re-embedded.
+        """
+        if len(candidates) < 2:
+            return candidates
+
+        vectors = np.vstack([self.index.reconstruct(label) for label, _ in candidates])
+        similarities = vectors @ vectors.T
+
+        kept = []
+        for i in range(len(candidates)):
+            if all(similarities[i, j] < max_similarity for j in kept):
+                kept.append(i)
+        return [candidates[i] for i in kept]
+
     def get_document_count(self) -> int:
         """Get the total number of documents/chunks in the store."""
         return self.collection.count()
@@ -142,11 +506,56 @@ class ClientVectorStore:
         if results['ids']:
             self.collection.delete(ids=results['ids'])
 
+        with closing(self._docs_db()) as conn, conn:
+            conn.execute("DELETE FROM docs")
+
+        with self._index_lock:
+            self._set_index(_new_faiss_index(), [])
+            self._saved_id_count = 0
+            self._save_index()
+
     def list_documents(self) -> List[str]:
         """List all unique document names in the collection."""
-        results = self.collection.get(include=['metadatas'])
-        doc_names = set()
-        for metadata in results['metadatas']:
-            if 'document_name' in metadata:
-                doc_names.add(metadata['document_name'])
-        return sorted(list(doc_names))
+        with closing(self._docs_db()) as conn:
+            return [name for (name,) in conn.execute("SELECT name FROM docs ORDER BY name")]
+
+# Open stores in LRU order; _store_lock only guards the dicts, while each client's
+# first open runs under its own lock so it doesn't hold up lookups for other clients
+_stores: "OrderedDict[str, ClientVectorStore]" = OrderedDict()
+_store_open_locks: Dict[str, threading.Lock] = {}
+_store_lock = threading.Lock()
+
+def _lookup_store(client_id: str) -> Optional[ClientVectorStore]:
+    """Return the open store for a client, marking it recently used; caller holds _store_lock."""
+    store = _stores.get(client_id)
+    if store is not None:
+        _stores.move_to_end(client_id)
+    return store
+
+def get_store(client_id: str) -> ClientVectorStore:
+    """
+    Get the open vector store for a client, reusing it across requests.
+
+    Stores are kept in an LRU cache so ChromaDB collections and FAISS indexes
+    aren't reopened per request; the per-client lock stops concurrent first
+    requests from opening the same client twice.
+    """
+    with _store_lock:
+        store = _lookup_store(client_id)
+        if store is not None:
+            return store
+        open_lock = _store_open_locks.setdefault(client_id, threading.Lock())
+
+    with open_lock:
+        with _store_lock:
+            store = _lookup_store(client_id)
+            if store is not None:
+                return store
+        store = ClientVectorStore(client_id)
+        with _store_lock:
+            _stores[client_id] = store
+            while len(_stores) > STORE_CACHE_SIZE:
+                _stores.popitem(last=False)
+            # Later callers find the store itself; waiters on this lock recheck the dict
+            _store_open_locks.pop(client_id, None)
+    return store
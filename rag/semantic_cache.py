@@ -0,0 +1,177 @@
+"""
+Semantic answer cache for the RAG system.
+Returns stored answers for queries whose embeddings are near-duplicates of
+earlier ones, skipping retrieval and LLM generation entirely.
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+# Clients whose caches are kept per process; the least recently used is dropped beyond this
+SEMANTIC_CACHE_CLIENTS = 64
+
+
+@functools.lru_cache(maxsize=None)
+def _hyperplanes(dim: int, n_planes: int, seed: int) -> np.ndarray:
+    """Random LSH hyperplanes, shared by every cache built with the same parameters."""
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((dim, n_planes)).astype(np.float32)
+    planes.setflags(write=False)
+    return planes
+
+
+class SemanticCache:
+    """
+    Embedding-keyed cache using random-projection LSH.
+
+    Each embedding is hashed to a bucket by the signs of its projections onto
+    n_planes random hyperplanes; a lookup only compares against entries in the
+    same bucket and hits when cosine similarity reaches the threshold.
+    Embeddings are expected to be L2-normalized so a dot product is the cosine.
+    Parameters that change the answer (e.g. top_k) are part of the bucket key,
+    so one cache serves every parameter combination without mixing them.
+
+    Entries are tied to a data version (e.g. the client's index file mtime):
+    a get() or set() with a different version drops everything cached, so
+    answers built from documents that were since changed, possibly by another
+    worker process, are never served.
+    """
+
+    def __init__(self, dim: int = 384, n_planes: int = 16, threshold: float = 0.95,
+                 max_size: int = 1024, ttl_seconds: float = 3600, seed: int = 0):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            dim: Embedding dimension
+            n_planes: Number of random hyperplanes (bits in the bucket key)
+            threshold: Minimum cosine similarity for a cache hit
+            max_size: Maximum entries kept before least-recently-used eviction
+            ttl_seconds: Seconds after which an entry expires
+            seed: Seed for the random hyperplanes
+        """
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._planes = _hyperplanes(dim, n_planes, seed)
+
+        # entry id -> (bucket key, embedding, value, created_at), in LRU order
+        self._entries: "OrderedDict[int, Tuple[Tuple, np.ndarray, Any, float]]" = OrderedDict()
+        self._buckets: Dict[Tuple, List[int]] = {}
+        self._next_id = 0
+        self._version: Any = None
+        self._lock = threading.Lock()
+
+    def _bucket_key(self, embedding: np.ndarray, params: Hashable) -> Tuple:
+        """Hash an embedding to its LSH bucket among entries stored with the same params."""
+        return (params, np.packbits(embedding @ self._planes > 0).tobytes())
+
+    def _remove(self, entry_id: int) -> None:
+        bucket_key = self._entries.pop(entry_id)[0]
+        bucket = self._buckets[bucket_key]
+        bucket.remove(entry_id)
+        if not bucket:
+            del self._buckets[bucket_key]
+
+    def _check_version(self, version: Any) -> None:
+        """Drop all entries if the data version changed; caller holds the lock."""
+        if version != self._version:
+            self._entries.clear()
+            self._buckets.clear()
+            self._version = version
+
+    def get(self, embedding: np.ndarray, version: Any = None,
+            params: Hashable = ()) -> Optional[Any]:
+        """
+        Look up a value stored for a semantically similar embedding.
+
+        Args:
+            embedding: Normalized query embedding
+            version: Current version of the data the cached values depend on
+            params: Request parameters the value must have been stored with
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        bucket_key = self._bucket_key(embedding, params)
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_version(version)
+            best_id = None
+            best_similarity = self.threshold
+            for entry_id in list(self._buckets.get(bucket_key, ())):
+                _, cached_embedding, _, created_at = self._entries[entry_id]
+                if now - created_at > self.ttl_seconds:
+                    self._remove(entry_id)
+                    continue
+                similarity = float(cached_embedding @ embedding)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                return None
+
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][2]
+
+    def set(self, embedding: np.ndarray, value: Any, version: Any = None,
+            params: Hashable = ()) -> None:
+        """
+        Store a value for an embedding, evicting the least recently used entry if full.
+
+        Args:
+            embedding: Normalized query embedding
+            value: Value to return for similar queries
+            version: Version of the data the value was computed from, read before computing it
+            params: Request parameters the value was computed with
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        bucket_key = self._bucket_key(embedding, params)
+
+        with self._lock:
+            self._check_version(version)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (bucket_key, embedding, value, time.monotonic())
+            self._buckets.setdefault(bucket_key, []).append(entry_id)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# One cache per client, in LRU order; retrieval parameters go into each entry's key
+_caches: "OrderedDict[str, SemanticCache]" = OrderedDict()
+_caches_lock = threading.Lock()
+
+def get_semantic_cache(client_id: str) -> SemanticCache:
+    """Get or create the semantic cache for a client, evicting the least recently used client's."""
+    with _caches_lock:
+        cache = _caches.get(client_id)
+        if cache is None:
+            cache = _caches[client_id] = SemanticCache()
+            while len(_caches) > SEMANTIC_CACHE_CLIENTS:
+                _caches.popitem(last=False)
+        else:
+            _caches.move_to_end(client_id)
+        return cache
+
+def clear_semantic_cache(client_id: str) -> None:
+    """Invalidate every cached answer for a client, e.g. after its documents change."""
+    with _caches_lock:
+        _caches.pop(client_id, None)
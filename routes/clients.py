@@ -1,8 +1,10 @@
 from fastapi import APIRouter
+from fastapi_cache.decorator import cache
 
 router = APIRouter()
 
 @router.get("/clients")
+@cache(expire=60)
 def list_clients():
     # Mocked for demo purposes
     return {
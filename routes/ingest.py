@@ -1,27 +1,99 @@
-from fastapi import APIRouter
+import zlib
+from typing import Callable, List
+from anyio import from_thread
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from fastapi_cache import FastAPICache
 from pydantic import BaseModel
-from rag.retriever import ClientVectorStore
+from rag.retriever import get_store
+from rag.semantic_cache import clear_semantic_cache
+from routes.query import DOCUMENTS_CACHE_NAMESPACE
 
-router = APIRouter()
+# Largest body a gzip-encoded request may inflate to, so a small gzip bomb can't exhaust memory
+MAX_DECOMPRESSED_BODY_BYTES = 16 * 1024 * 1024
+
+def _gunzip(body: bytes) -> bytes:
+    """Decompress a gzip body, rejecting output larger than MAX_DECOMPRESSED_BODY_BYTES."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, MAX_DECOMPRESSED_BODY_BYTES + 1)
+    except zlib.error:
+        raise HTTPException(status_code=400, detail="Invalid gzip request body")
+    if len(data) > MAX_DECOMPRESSED_BODY_BYTES or decompressor.unconsumed_tail:
+        raise HTTPException(status_code=413, detail="Decompressed request body too large")
+    if not decompressor.eof:
+        raise HTTPException(status_code=400, detail="Truncated gzip request body")
+    return data
+
+class GzipRequest(Request):
+    """Request whose body is transparently gunzipped when sent with Content-Encoding: gzip."""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if "gzip" in self.headers.getlist("Content-Encoding"):
+                body = _gunzip(body)
+            self._body = body
+        return self._body
+
+class GzipRoute(APIRoute):
+    """Route class that accepts gzip-compressed request bodies from the ingest client."""
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = GzipRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler
+
+router = APIRouter(route_class=GzipRoute)
 
 class IngestRequest(BaseModel):
     document_name: str
     text: str
     metadata: dict
 
+def _chunk_metadata(request: IngestRequest) -> dict:
+    return {
+        "document": request.document_name,
+        **request.metadata
+    }
+
 @router.post("/{client_id}/ingest")
 def ingest_documents(client_id: str, request: IngestRequest):
-    store = ClientVectorStore(client_id)
+    store = get_store(client_id)
 
     store.add_texts(
         texts=[request.text],
-        metadatas=[{
-            "document": request.document_name,
-            **request.metadata
-        }]
+        metadatas=[_chunk_metadata(request)]
     )
 
+    # Sync route runs in the threadpool, so hop back to the event loop to invalidate
+    from_thread.run(FastAPICache.clear, DOCUMENTS_CACHE_NAMESPACE)
+    clear_semantic_cache(client_id)
+
     return {
         "status": "success",
         "client_id": client_id
     }
+
+@router.post("/{client_id}/ingest_bulk")
+def ingest_documents_bulk(client_id: str, chunks: List[IngestRequest]):
+    """Ingest many chunks in one request so they are embedded and stored as a single batch."""
+    store = get_store(client_id)
+
+    store.add_texts(
+        texts=[chunk.text for chunk in chunks],
+        metadatas=[_chunk_metadata(chunk) for chunk in chunks]
+    )
+
+    from_thread.run(FastAPICache.clear, DOCUMENTS_CACHE_NAMESPACE)
+    clear_semantic_cache(client_id)
+
+    return {
+        "status": "success",
+        "client_id": client_id,
+        "ingested": len(chunks)
+    }
@@ -4,18 +4,41 @@ Provides endpoints for semantic search and LLM-powered answer generation.
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi_cache import FastAPICache
+from fastapi_cache.decorator import cache
+from fastapi_cache.key_builder import default_key_builder
 from pydantic import BaseModel
-from rag.retriever import ClientVectorStore
+from rag.retriever import FAISS_EF_SEARCH, get_store, index_version
 from rag.generator import get_generator
+from rag.semantic_cache import clear_semantic_cache, get_semantic_cache
+import asyncio
 import logging
+import orjson
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Cache namespace for document listings; cleared whenever a client's documents change
+DOCUMENTS_CACHE_NAMESPACE = "documents"
+
+async def _documents_cache_key(func, namespace: str = "", **kwargs) -> str:
+    """
+    Cache key for a client's document listing, including its index version.
+
+    The in-memory backend is per worker and a clear only reaches the worker
+    that ran the ingest or delete; keying on the index version every worker
+    can stat makes the others miss too after a change.
+    """
+    version = await asyncio.to_thread(index_version, kwargs["kwargs"]["client_id"])
+    return f"{default_key_builder(func, namespace, **kwargs)}:{version[0]}:{version[1]}"
+
 class QueryRequest(BaseModel):
     """Request model for document queries."""
     query: str
     top_k: int = 5
+    # HNSW search breadth: lower is faster, higher improves recall
+    ef_search: int = FAISS_EF_SEARCH
 
 class QueryResponse(BaseModel):
     """Response model for query results with generated answers."""
@@ -44,20 +67,21 @@ async def query_documents(client_id: str, request: QueryRequest):
         QueryResponse with answer, sources, and metadata
     """
     try:
-        # Validate input
-        if not request.query.strip():
-            raise HTTPException(status_code=400, detail="Query cannot be empty")
-
-        if request.top_k < 1 or request.top_k > 20:
-            raise HTTPException(status_code=400, detail="top_k must be between 1 and 20")
+        _validate_query(request)
 
         logger.info(f"Processing query for client {client_id}: {request.query[:50]}...")
 
-        # Initialize vector store for client
-        store = ClientVectorStore(client_id)
+        # Initialize vector store for client; opening, counting, embedding and searching block,
+        # so they run in worker threads to keep the event loop free
+        store = await asyncio.to_thread(get_store, client_id)
 
-        # Check if client has any documents
-        doc_count = store.get_document_count()
+        # Check if client has any documents while the query is embedded; the index
+        # version is read before retrieval so a cached answer is never newer than it
+        doc_count, query_embedding, version = await asyncio.gather(
+            asyncio.to_thread(store.get_document_count),
+            asyncio.to_thread(store.embed_query, request.query),
+            asyncio.to_thread(index_version, client_id)
+        )
         if doc_count == 0:
             return QueryResponse(
                 query=request.query,
@@ -68,8 +92,20 @@ async def query_documents(client_id: str, request: QueryRequest):
                 context_chunks_used=0
             )
 
+        # Serve near-duplicate queries straight from the semantic cache; answers
+        # depend on the retrieval parameters, so they are part of the key
+        semantic_cache = get_semantic_cache(client_id)
+        cache_params = (request.top_k, request.ef_search)
+        cached_response = semantic_cache.get(query_embedding, version, cache_params)
+        if cached_response is not None:
+            logger.info(f"Semantic cache hit for client {client_id}")
+            return cached_response.model_copy(update={"query": request.query})
+
         # Retrieve relevant chunks
-        retrieved_chunks = store.search(request.query, request.top_k)
+        retrieved_chunks = await asyncio.to_thread(
+            store.search, request.query, request.top_k,
+            query_embedding=query_embedding, ef_search=request.ef_search
+        )
 
         if not retrieved_chunks:
             return QueryResponse(
@@ -82,11 +118,12 @@ async def query_documents(client_id: str, request: QueryRequest):
             )
 
         # Generate answer using local LLM
-        generator = get_generator()
-        generation_result = generator.generate_answer(
-            query=request.query,
-            context_chunks=retrieved_chunks
-        )
+        generator = await asyncio.to_thread(get_generator)
+        async with generator.slots:
+            generation_result = await generator.generate_answer(
+                query=request.query,
+                context_chunks=retrieved_chunks
+            )
 
         # Format response
         response = QueryResponse(
@@ -98,6 +135,8 @@ async def query_documents(client_id: str, request: QueryRequest):
             context_chunks_used=generation_result["context_chunks_used"]
         )
 
+        semantic_cache.set(query_embedding, response, version, cache_params)
+
         logger.info(f"Query completed for client {client_id} in {generation_result['generation_time_seconds']:.2f}s")
         return response
 
@@ -107,7 +146,133 @@ async def query_documents(client_id: str, request: QueryRequest):
         logger.error(f"Error processing query for client {client_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def _validate_query(request: QueryRequest) -> None:
+    """Reject empty queries and out-of-range retrieval depths."""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    if request.top_k < 1 or request.top_k > 20:
+        raise HTTPException(status_code=400, detail="top_k must be between 1 and 20")
+
+    if request.ef_search < 1 or request.ef_search > 512:
+        raise HTTPException(status_code=400, detail="ef_search must be between 1 and 512")
+
+def _sse(data: dict, event: str = None) -> bytes:
+    """Encode one Server-Sent Events message."""
+    message = b"data: " + orjson.dumps(data) + b"\n\n"
+    if event:
+        message = f"event: {event}\n".encode() + message
+    return message
+
+def _sse_answer(response: QueryResponse) -> list:
+    """SSE messages replaying a complete answer: one token event, then the final event."""
+    return [
+        _sse({"token": response.answer}),
+        _sse(response.model_dump(), event="done")
+    ]
+
+@router.post("/{client_id}/query/stream")
+async def query_documents_stream(client_id: str, request: QueryRequest):
+    """
+    Query documents and stream the generated answer as Server-Sent Events.
+
+    Each generated piece arrives as a `data: {"token": ...}` message; a final
+    `done` event carries the cleaned answer, sources, retrieved chunks and
+    timing, matching the /query response body.
+
+    Args:
+        client_id: Unique identifier for the client
+        request: Query request with question and retrieval parameters
+
+    Returns:
+        StreamingResponse with media type text/event-stream
+    """
+    _validate_query(request)
+
+    logger.info(f"Streaming query for client {client_id}: {request.query[:50]}...")
+
+    async def events():
+        try:
+            store = await asyncio.to_thread(get_store, client_id)
+
+            doc_count, query_embedding, version = await asyncio.gather(
+                asyncio.to_thread(store.get_document_count),
+                asyncio.to_thread(store.embed_query, request.query),
+                asyncio.to_thread(index_version, client_id)
+            )
+            if doc_count == 0:
+                for message in _sse_answer(QueryResponse(
+                    query=request.query,
+                    answer="No documents found for this client. Please ingest some documents first.",
+                    sources=[],
+                    retrieved_chunks=[],
+                    generation_time_seconds=0.0,
+                    context_chunks_used=0
+                )):
+                    yield message
+                return
+
+            semantic_cache = get_semantic_cache(client_id)
+            cache_params = (request.top_k, request.ef_search)
+            cached_response = semantic_cache.get(query_embedding, version, cache_params)
+            if cached_response is not None:
+                logger.info(f"Semantic cache hit for client {client_id}")
+                for message in _sse_answer(cached_response.model_copy(update={"query": request.query})):
+                    yield message
+                return
+
+            retrieved_chunks = await asyncio.to_thread(
+                store.search, request.query, request.top_k,
+                query_embedding=query_embedding, ef_search=request.ef_search
+            )
+            if not retrieved_chunks:
+                for message in _sse_answer(QueryResponse(
+                    query=request.query,
+                    answer="No relevant information found in the documents.",
+                    sources=[],
+                    retrieved_chunks=[],
+                    generation_time_seconds=0.0,
+                    context_chunks_used=0
+                )):
+                    yield message
+                return
+
+            generator = await asyncio.to_thread(get_generator)
+            async with generator.slots:
+                async for event in generator.stream_answer(
+                    query=request.query,
+                    context_chunks=retrieved_chunks
+                ):
+                    if "token" in event:
+                        yield _sse(event)
+                        continue
+
+                    response = QueryResponse(
+                        query=request.query,
+                        answer=event["answer"],
+                        sources=event["sources"],
+                        retrieved_chunks=retrieved_chunks,
+                        generation_time_seconds=event["generation_time_seconds"],
+                        context_chunks_used=event["context_chunks_used"]
+                    )
+                    semantic_cache.set(query_embedding, response, version, cache_params)
+                    yield _sse(response.model_dump(), event="done")
+
+            logger.info(f"Streamed query completed for client {client_id}")
+
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error streaming query for client {client_id}: {e}")
+            yield _sse({"detail": f"Internal server error: {str(e)}"}, event="error")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{client_id}/documents")
+@cache(expire=60, namespace=DOCUMENTS_CACHE_NAMESPACE, key_builder=_documents_cache_key)
 async def list_client_documents(client_id: str):
     """
     List all documents available for a client.
@@ -119,8 +284,8 @@ async def list_client_documents(client_id: str):
         List of document names
     """
     try:
-        store = ClientVectorStore(client_id)
-        documents = store.list_documents()
+        store = await asyncio.to_thread(get_store, client_id)
+        documents = await asyncio.to_thread(store.list_documents)
 
         return {
             "client_id": client_id,
@@ -144,10 +309,12 @@ async def clear_client_documents(client_id: str):
         Confirmation message
     """
     try:
-        store = ClientVectorStore(client_id)
-        initial_count = store.get_document_count()
+        store = await asyncio.to_thread(get_store, client_id)
+        initial_count = await asyncio.to_thread(store.get_document_count)
 
-        store.delete_all()
+        await asyncio.to_thread(store.delete_all)
+        await FastAPICache.clear(namespace=DOCUMENTS_CACHE_NAMESPACE)
+        clear_semantic_cache(client_id)
 
         return {
             "message": f"Cleared {initial_count} documents for client {client_id}",
@@ -4,16 +4,29 @@ Test script for the RAG system query functionality.
 Demonstrates retrieval and answer generation capabilities.
 """
 
+import argparse
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any
+
+if TYPE_CHECKING:
+    import httpx
 
 API_BASE_URL = "http://127.0.0.1:8000"
 CLIENT_ID = "client_001"
 
-def test_query(query: str, top_k: int = 3, description: str = "") -> Dict[str, Any]:
-    """Test a single query and return the results."""
+# Allow more time for LLM generation
+QUERY_TIMEOUT = 60
+
+# One keep-alive connection pool shared by every request in the run
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=16))
+SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=16))
+
+def _print_query_header(query: str, top_k: int, description: str) -> None:
     print(f"\n{'='*60}")
     if description:
         print(f"🧪 {description}")
@@ -21,50 +34,86 @@ def test_query(query: str, top_k: int = 3, description: str = "") -> Dict[str, A
     print(f"🎯 Top-K: {top_k}")
     print(f"{'='*60}")
 
+def _report_query(status_code: int, body: str, total_time: float) -> Dict[str, Any]:
+    """Print the outcome of a query request and return the parsed result, or None on failure."""
+    if status_code == 200:
+        result = json.loads(body)
+
+        print("✅ Query successful!")
+        print(f"⏱️  Total time: {total_time:.2f}s")
+        print(f"🤖 Generated Answer:")
+        print(f"   {result['answer']}")
+        print(f"\n📚 Sources: {', '.join(result['sources'])}")
+        print(f"📄 Chunks used: {result['context_chunks_used']}")
+        print(f"⏱️  Generation time: {result['generation_time_seconds']:.2f}s")
+
+        if result['retrieved_chunks']:
+            print(f"\n🔍 Retrieved Chunks Preview:")
+            for i, chunk in enumerate(result['retrieved_chunks'][:2], 1):  # Show first 2 chunks
+                metadata = chunk['metadata']
+                print(f"   Chunk {i}: {metadata['document_name']} - {metadata['section']}")
+                print(f"   \"{chunk['text'][:150]}...\"")
+                print(f"   Score: {chunk.get('score', 'N/A'):.3f}")
+
+        return result
+    else:
+        print(f"❌ Query failed: {status_code}")
+        print(f"Response: {body}")
+        return None
+
+def test_query(query: str, top_k: int = 3, description: str = "") -> Dict[str, Any]:
+    """Test a single query and return the results."""
+    _print_query_header(query, top_k, description)
+
     try:
         start_time = time.time()
-        response = requests.post(
+        response = SESSION.post(
             f"{API_BASE_URL}/clients/{CLIENT_ID}/query",
             json={"query": query, "top_k": top_k},
-            timeout=60  # Allow more time for LLM generation
+            timeout=QUERY_TIMEOUT
         )
         end_time = time.time()
 
-        if response.status_code == 200:
-            result = response.json()
-            total_time = end_time - start_time
-
-            print("✅ Query successful!")
-            print(f"⏱️  Total time: {total_time:.2f}s")
-            print(f"🤖 Generated Answer:")
-            print(f"   {result['answer']}")
-            print(f"\n📚 Sources: {', '.join(result['sources'])}")
-            print(f"📄 Chunks used: {result['context_chunks_used']}")
-            print(f"⏱️  Generation time: {result['generation_time_seconds']:.2f}s")
-
-            if result['retrieved_chunks']:
-                print(f"\n🔍 Retrieved Chunks Preview:")
-                for i, chunk in enumerate(result['retrieved_chunks'][:2], 1):  # Show first 2 chunks
-                    metadata = chunk['metadata']
-                    print(f"   Chunk {i}: {metadata['document_name']} - {metadata['section']}")
-                    print(f"   \"{chunk['text'][:150]}...\"")
-                    print(f"   Score: {chunk.get('score', 'N/A'):.3f}")
-
-            return result
-        else:
-            print(f"❌ Query failed: {response.status_code}")
-            print(f"Response: {response.text}")
-            return None
+        return _report_query(response.status_code, response.text, end_time - start_time)
 
     except Exception as e:
         print(f"❌ Query error: {e}")
         return None
 
+async def test_query_async(client: "httpx.AsyncClient", semaphore: asyncio.Semaphore,
+                           query: str, top_k: int = 3, description: str = "") -> Dict[str, Any]:
+    """Test a single query concurrently with others; output is printed once the answer arrives."""
+    async with semaphore:
+        try:
+            start_time = time.time()
+            response = await client.post(
+                f"{API_BASE_URL}/clients/{CLIENT_ID}/query",
+                json={"query": query, "top_k": top_k}
+            )
+            end_time = time.time()
+        except Exception as e:
+            _print_query_header(query, top_k, description)
+            print(f"❌ Query error: {e}")
+            return None
+
+    _print_query_header(query, top_k, description)
+    return _report_query(response.status_code, response.text, end_time - start_time)
+
+async def run_queries_async(test_queries: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+    """Send all test queries at once, with at most `concurrency` in flight."""
+    import httpx  # only needed for --concurrency > 1
+
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=QUERY_TIMEOUT) as client:
+        return await asyncio.gather(*[
+            test_query_async(client, semaphore, **test_case) for test_case in test_queries
+        ])
+
 def test_health_check():
     """Test the health endpoint."""
     print("\n🏥 Testing health check...")
     try:
-        response = requests.get(f"{API_BASE_URL}/health")
+        response = SESSION.get(f"{API_BASE_URL}/health")
         if response.status_code == 200:
             print("✅ Health check passed!")
             return True
@@ -79,7 +128,7 @@ def test_list_documents():
     """Test listing client documents."""
     print("\n📋 Testing document listing...")
     try:
-        response = requests.get(f"{API_BASE_URL}/clients/{CLIENT_ID}/documents")
+        response = SESSION.get(f"{API_BASE_URL}/clients/{CLIENT_ID}/documents")
         if response.status_code == 200:
             result = response.json()
             print("✅ Document listing successful!")
@@ -94,8 +143,17 @@ def test_list_documents():
         print(f"❌ Document listing error: {e}")
         return None
 
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Run sample queries against the RAG API.")
+    parser.add_argument("-c", "--concurrency", type=int, default=1,
+                        help="Queries in flight at once; above 1, queries run concurrently with httpx (default: 1)")
+    return parser.parse_args()
+
 def main():
     """Run comprehensive query tests."""
+    args = parse_args()
+
     print("🚀 Starting RAG System Query Tests")
     print(f"🌐 API URL: {API_BASE_URL}")
     print(f"👤 Client ID: {CLIENT_ID}")
@@ -155,11 +213,14 @@ def main():
         }
     ]
 
-    results = []
-    for test_case in test_queries:
-        result = test_query(**test_case)
-        if result:
-            results.append(result)
+    if args.concurrency > 1:
+        results = [r for r in asyncio.run(run_queries_async(test_queries, args.concurrency)) if r]
+    else:
+        results = []
+        for test_case in test_queries:
+            result = test_query(**test_case)
+            if result:
+                results.append(result)
 
     # Summary
     print(f"\n{'='*60}")